@@ -1,12 +1,16 @@
 import asyncio
+import importlib
+import json
 import logging
-import math
 import time
-from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime
+from enum import IntEnum
+from types import SimpleNamespace
 from typing import Dict, Optional
 
+import aiohttp
+import numpy as np
+import orjson
 from binance import AsyncClient, BinanceSocketManager
 
 import loggerfactory
@@ -14,7 +18,6 @@ import mailsender
 from balancesync import USDCBalanceSync
 from datasaver import KlineDataSaver
 from polymarkettrader import PolymarketTrader
-import webredeemer
 
 import os
 from dotenv import load_dotenv
@@ -36,15 +39,57 @@ PM_BUILDER_PASSPHRASE = os.environ.get("PM_BUILDER_PASSPHRASE")
 TRADE_PAIR_UP = os.environ.get("TRADE_PAIR_UP")
 TRADE_PAIR_DOWN = os.environ.get("TRADE_PAIR_DOWN")
 TRADE_PAIR_EXCHANGE = os.environ.get("TRADE_PAIR_EXCHANGE")
+# 是否通过浏览器网页赎回持仓（默认开启；关闭时直接调用CTF合约赎回，代理钱包尚未验证可用）
+WEB_REDEEM_SWITCH = mailsender.bool_map.get(os.environ.get("WEB_REDEEM_SWITCH"), True)
+# 去掉计价币后缀（如usdc）的标的名称，用于拼接Polymarket市场
+TRADE_PAIR_UP_BASE = TRADE_PAIR_UP[:-4] if TRADE_PAIR_UP else None
+TRADE_PAIR_DOWN_BASE = TRADE_PAIR_DOWN[:-4] if TRADE_PAIR_DOWN else None
+# 下单参数模板，下单时只需补充数量
+_ORDER_TEMPLATE = (
+    {"symbol": TRADE_PAIR_UP_BASE, "position": "up", "side": "BUY", "price": 0.5},
+    {"symbol": TRADE_PAIR_DOWN_BASE, "position": "down", "side": "BUY", "price": 0.5},
+)
 
 # 配置日志
 LOGGING_LEVEL = os.environ.get("LOGGING_LEVEL", "INFO")
 logger = loggerfactory.get_logger(logging.getLevelNamesMapping()[LOGGING_LEVEL])
 
+# 每个交易对保留的已闭合K线数量
+KLINE_WINDOW = 20
 
-@dataclass
+
+def _install_orjson_decoder() -> None:
+    """将python-binance WebSocket模块中的json.loads替换为orjson.loads（dumps保持标准库实现）"""
+    json_shim = SimpleNamespace(loads=orjson.loads, dumps=json.dumps, JSONDecodeError=orjson.JSONDecodeError)
+    # 新版本位于binance.ws.reconnecting_websocket，旧版本位于binance.streams
+    for module_name in ("binance.ws.reconnecting_websocket", "binance.streams"):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        if hasattr(module, "json"):
+            module.json = json_shim
+            logger.debug(f"已为 {module_name} 启用orjson解析")
+
+
+_install_orjson_decoder()
+
+
+def _parse_kline(k: dict) -> tuple:
+    """将币安K线消息中的价格字段一次性解析为浮点数，返回 (开盘, 收盘, 最高, 最低, 成交量)"""
+    return float(k['o']), float(k['c']), float(k['h']), float(k['l']), float(k['v'])
+
+
+class KlineUpdate(IntEnum):
+    """K线更新结果"""
+    NO_CHANGE = 0  # 过期消息，未更新任何数据
+    CURRENT_UPDATED = 1  # 仅更新了当前未闭合K线
+    CLOSED_APPENDED = 2  # 新增了一根已闭合K线
+
+
+@dataclass(slots=True, frozen=True)
 class KlineData:
-    """K线数据类"""
+    """K线数据类（构造后不可变，派生字段在初始化时一次性计算）"""
     symbol: str
     open_time: int
     close_time: int
@@ -54,50 +99,72 @@ class KlineData:
     low: float
     volume: float
     is_closed: bool
+    is_bullish: bool = field(init=False)  # 是否为阳线（收盘价高于开盘价）
+    is_bearish: bool = field(init=False)  # 是否为阴线（收盘价低于开盘价）
+    price_change: float = field(init=False)  # 价格变化百分比
 
-    @property
-    def is_bullish(self) -> bool:
-        """判断是否为阳线（收盘价高于开盘价）"""
-        return self.close_price > self.open_price
-
-    @property
-    def is_bearish(self) -> bool:
-        """判断是否为阴线（收盘价低于开盘价）"""
-        return self.close_price < self.open_price
-
-    @property
-    def price_change(self) -> float:
-        """价格变化百分比"""
-        return ((self.close_price - self.open_price) / self.open_price) * 100 if self.open_price > 0 else 0
+    def __post_init__(self) -> None:
+        object.__setattr__(self, 'is_bullish', self.close_price > self.open_price)
+        object.__setattr__(self, 'is_bearish', self.close_price < self.open_price)
+        object.__setattr__(self, 'price_change',
+                           ((self.close_price - self.open_price) / self.open_price) * 100
+                           if self.open_price > 0 else 0)
 
 
 @dataclass
 class TradingPairMonitor:
-    """交易对监控器"""
+    """交易对监控器（已闭合K线按列存储在环形缓冲区中，只保留开盘价和收盘价）"""
     symbol: str
-    klines: deque = field(default_factory=lambda: deque(maxlen=20))  # 存储最近20根K线
+    open: np.ndarray = field(default_factory=lambda: np.empty(KLINE_WINDOW, dtype=np.float64))  # 最近20根K线开盘价
+    close: np.ndarray = field(default_factory=lambda: np.empty(KLINE_WINDOW, dtype=np.float64))  # 最近20根K线收盘价
+    cursor: int = 0  # 下一次写入位置
+    count: int = 0  # 已存储的K线数量
     current_kline: Optional[KlineData] = None
 
-    def update_kline(self, kline_msg: dict) -> None:
-        """更新K线数据"""
+    def _append_closed(self, kline: KlineData) -> None:
+        """写入一根已闭合K线"""
+        self.open[self.cursor] = kline.open_price
+        self.close[self.cursor] = kline.close_price
+        self.cursor = (self.cursor + 1) % KLINE_WINDOW
+        if self.count < KLINE_WINDOW:
+            self.count += 1
+
+    def last_bullish(self, i: int = 1) -> bool:
+        """倒数第i根已闭合K线是否为阳线（i=1为上一个周期）"""
+        idx = (self.cursor - i) % KLINE_WINDOW
+        return self.close[idx] > self.open[idx]
+
+    def last_bearish(self, i: int = 1) -> bool:
+        """倒数第i根已闭合K线是否为阴线（i=1为上一个周期）"""
+        idx = (self.cursor - i) % KLINE_WINDOW
+        return self.close[idx] < self.open[idx]
+
+    def update_kline(self, kline_msg: dict, parsed: tuple) -> KlineUpdate:
+        """更新K线数据（parsed 为 _parse_kline 的解析结果），返回本次更新的类型"""
         k = kline_msg['k']
+        # 忽略乱序到达的旧周期消息
+        if self.current_kline and k['t'] < self.current_kline.open_time:
+            return KlineUpdate.NO_CHANGE
+        open_price, close_price, high, low, volume = parsed
 
         kline_data = KlineData(
             symbol=self.symbol,
             open_time=k['t'],
             close_time=k['T'],
-            open_price=float(k['o']),
-            close_price=float(k['c']),
-            high=float(k['h']),
-            low=float(k['l']),
-            volume=float(k['v']),
+            open_price=open_price,
+            close_price=close_price,
+            high=high,
+            low=low,
+            volume=volume,
             is_closed=k['x']  # K线是否已闭合
         )
 
+        result = KlineUpdate.CURRENT_UPDATED
         # 如果是新K线开始
         if not self.current_kline or self.current_kline.open_time != kline_data.open_time:
             if self.current_kline and self.current_kline.is_closed:
-                self.klines.append(self.current_kline)
+                self._append_closed(self.current_kline)
+                result = KlineUpdate.CLOSED_APPENDED
             self.current_kline = kline_data
         else:
             # 更新当前K线
@@ -105,6 +172,7 @@ class TradingPairMonitor:
 
         logger.debug(f"{self.symbol} K线更新: 开盘={kline_data.open_price}, 收盘={kline_data.close_price}, "
                      f"是否闭合={kline_data.is_closed}")
+        return result
 
 
 class PmTradingStrategy:
@@ -113,34 +181,44 @@ class PmTradingStrategy:
     def __init__(self, pm_trader: PolymarketTrader, balance_sync: Optional[USDCBalanceSync]):
         self.monitors: Dict[str, TradingPairMonitor] = {}
         self.entry_condition_active = False
-        self.last_notification_time = 0
-        self.notification_cooldown = 60 * 2  # 通知冷却时间（秒）
+        self.last_notification_time_ns = 0  # 上次通知时间（单调时钟，纳秒）
+        self._cooldown_ns = 120 * 1_000_000_000  # 通知冷却时间（纳秒），不受系统时间校准影响
         self.pm_trader = pm_trader
         self.balance_sync = balance_sync
+        self._pending_buy_task: Optional[asyncio.Task] = None  # 进行中的买入任务（持有强引用，防止被GC回收）
 
         # 初始化监控器
         symbols = [TRADE_PAIR_UP, TRADE_PAIR_DOWN, TRADE_PAIR_EXCHANGE]
         for symbol in symbols:
             self.monitors[symbol] = TradingPairMonitor(symbol=symbol)
+        # 直接持有各监控器引用，避免每个tick都查字典
+        self.up_monitor = self.monitors[TRADE_PAIR_UP]
+        self.down_monitor = self.monitors[TRADE_PAIR_DOWN]
+        self.exchange_monitor = self.monitors[TRADE_PAIR_EXCHANGE]
 
-    def update_data(self, symbol: str, kline_msg: dict) -> None:
+    def update_data(self, symbol: str, kline_msg: dict, parsed: tuple) -> None:
         """更新交易对数据"""
-        if symbol in self.monitors:
-            self.monitors[symbol].update_kline(kline_msg)
-            self._check_conditions()
+        monitor = self.monitors.get(symbol)
+        if monitor is not None:
+            result = monitor.update_kline(kline_msg, parsed)
+            if result is KlineUpdate.CLOSED_APPENDED:
+                self._check_conditions()
+            elif result is KlineUpdate.CURRENT_UPDATED and self.entry_condition_active:
+                # 入场/出场条件只依赖已闭合K线，未闭合K线更新时只需检查通知条件
+                self._check_notification_condition(self.exchange_monitor)
 
     def _check_conditions(self) -> None:
         """检查所有交易条件"""
 
         # 确保有足够的历史数据
         for monitor in self.monitors.values():
-            if len(monitor.klines) < 2:
+            if monitor.count < 2:
                 return
 
         # 获取各交易对数据
-        up_pair = self.monitors[TRADE_PAIR_UP]
-        down_pair = self.monitors[TRADE_PAIR_DOWN]
-        exchange_pair = self.monitors[TRADE_PAIR_EXCHANGE]
+        up_pair = self.up_monitor
+        down_pair = self.down_monitor
+        exchange_pair = self.exchange_monitor
 
         # 检查入场条件（条件2）
         if self._check_entry_conditions(up_pair, down_pair, exchange_pair):
@@ -162,29 +240,20 @@ class PmTradingStrategy:
                                 down_pair: TradingPairMonitor,
                                 exchange_pair: TradingPairMonitor) -> bool:
         """检查入场条件"""
-        if len(exchange_pair.klines) < 2:
+        # 需要至少两根K线
+        if exchange_pair.count < 2 or not up_pair.count or not down_pair.count:
             return False
 
-        # 获取最近两根K线
-        exchange_pair_kline1 = list(exchange_pair.klines)[-1]  # 上一个周期
-        exchange_pair_kline2 = list(exchange_pair.klines)[-2]  # 上上个周期
-
-        # 条件1: XRP/BTC连续两个周期上涨
-        if not (exchange_pair_kline2.is_bullish and exchange_pair_kline1.is_bullish):
+        # 条件1: XRP/BTC连续两个周期上涨（上上个周期和上一个周期）
+        if not (exchange_pair.last_bullish(2) and exchange_pair.last_bullish(1)):
             return False
 
         # 条件2: BTC/USDC上一个周期阴线
-        if len(up_pair.klines) < 1:
-            return False
-        up_pair_last = list(up_pair.klines)[-1]
-        if not up_pair_last.is_bearish:
+        if not up_pair.last_bearish():
             return False
 
         # 条件3: XRP/USDC上一个周期阳线
-        if len(down_pair.klines) < 1:
-            return False
-        down_pair_last = list(down_pair.klines)[-1]
-        if not down_pair_last.is_bullish:
+        if not down_pair.last_bullish():
             return False
 
         return True
@@ -193,61 +262,54 @@ class PmTradingStrategy:
                                down_pair: TradingPairMonitor,
                                exchange_pair: TradingPairMonitor) -> bool:
         """检查出场条件"""
-        if len(exchange_pair.klines) < 2:
+        if exchange_pair.count < 2 or not up_pair.count or not down_pair.count:
             return False
 
-        # 获取最近两根K线
-        exchange_pair_kline1 = list(exchange_pair.klines)[-1]  # 上一个周期
-        exchange_pair_kline2 = list(exchange_pair.klines)[-2]  # 上上个周期
-
-        # 条件1: XRP/BTC连续两个周期下跌
-        if not (exchange_pair_kline2.is_bearish and exchange_pair_kline1.is_bearish):
+        # 条件1: XRP/BTC连续两个周期下跌（上上个周期和上一个周期）
+        if not (exchange_pair.last_bearish(2) and exchange_pair.last_bearish(1)):
             return False
 
         # 条件2: BTC/USDC上一个周期阳线
-        if len(up_pair.klines) < 1:
-            return False
-        up_pair_last = list(up_pair.klines)[-1]
-        if not up_pair_last.is_bullish:
+        if not up_pair.last_bullish():
             return False
 
         # 条件3: XRP/USDC上一个周期阴线
-        if len(down_pair.klines) < 1:
-            return False
-        down_pair_last = list(down_pair.klines)[-1]
-        if not down_pair_last.is_bearish:
+        if not down_pair.last_bearish():
             return False
 
         return True
 
     def _check_notification_condition(self, exchange_pair: TradingPairMonitor) -> None:
         """检查通知触发条件"""
-        current_time = time.time()
+        now_ns = time.monotonic_ns()
 
         # 检查冷却时间
-        if current_time - self.last_notification_time < self.notification_cooldown:
+        if now_ns - self.last_notification_time_ns < self._cooldown_ns:
+            return
+
+        # 上一次买入尚未完成时不重复触发
+        if self._pending_buy_task and not self._pending_buy_task.done():
             return
 
         # 需要至少两根K线
-        if len(exchange_pair.klines) < 2:
+        if exchange_pair.count < 2:
             return
 
         # 条件1: XRP/BTC在上一个周期下跌
-        exchange_pair_kline1 = list(exchange_pair.klines)[-1]
-
-        if not exchange_pair_kline1.is_bearish:
+        if not exchange_pair.last_bearish():
             return
 
         # 条件2: 当前周期剩余2分钟且当前周期下跌
         if exchange_pair.current_kline:
             remaining_time = self._get_kline_remaining_time(exchange_pair.current_kline)
             if 0 <= remaining_time <= 120 and exchange_pair.current_kline.is_bearish:  # 剩余2分钟左右且当前下跌（考虑网络延迟）
-                asyncio.create_task(self._trigger_buy_action())
-                self.last_notification_time = current_time
+                self.last_notification_time_ns = now_ns
+                self._pending_buy_task = asyncio.create_task(self._trigger_buy_action())
+                self._pending_buy_task.add_done_callback(self.handle_task_result)
 
     def _get_kline_remaining_time(self, kline: KlineData) -> int:
         """获取K线剩余时间（秒）"""
-        current_timestamp = int(time.time() * 1000)
+        current_timestamp = time.time_ns() // 1_000_000
         remaining_ms = kline.close_time - current_timestamp
         return max(0, remaining_ms // 1000)
 
@@ -256,24 +318,34 @@ class PmTradingStrategy:
         buy_size = 5
 
         if self.balance_sync.is_running():
-            buy_size = math.floor(self.balance_sync.get_latest_balance() * 100) / 100
-            buy_size = math.floor(buy_size)
+            # 按整数USDC下单，直接向下取整
+            buy_size = int(self.balance_sync.get_latest_balance())
             if buy_size < 5:
                 # 尝试赎回持仓
-                redeemable_positions = self.pm_trader.get_redeemable_positions()
+                redeemable_positions = await self.pm_trader.get_redeemable_positions()
                 if len(redeemable_positions) > 0:
-                    # TODO 受限Python的clob client未支持调用链上合约，尝试手动实现调用ctf合约链上abi无果（参考ctfredeemer.py），这里没实现代理钱包的支持 暂时改用网页触发赎回持仓
-                    # await self.pm_trader.redeem(redeemable_positions)
-                    webredeemer.redeemer_in_web()
-                    buy_size = math.floor(await self.balance_sync.fetch_usdc_balance() * 100) / 100
+                    # TODO 受限Python的clob client未支持调用链上合约，尝试手动实现调用ctf合约链上abi无果（参考ctfredeemer.py），这里没实现代理钱包的支持 暂时默认改用网页触发赎回持仓
+                    try:
+                        if WEB_REDEEM_SWITCH:
+                            # 网页赎回需要启动浏览器，仅按需导入，并放到线程中执行避免阻塞事件循环
+                            import webredeemer
+                            await asyncio.to_thread(webredeemer.redeemer_in_web)
+                        else:
+                            await self.pm_trader.redeem(redeemable_positions)
+                    except Exception as e:
+                        # 赎回失败不影响本次买入，按当前余额继续下单
+                        logger.error(f"赎回持仓失败: {e}")
+                    balance = await self.balance_sync.fetch_usdc_balance()
+                    if balance is not None:
+                        buy_size = int(balance)
 
             elif buy_size > 500:
                 logger.error("⬆️ 余额达到500上限, 按500买入...")
                 buy_size = 500
 
         order_args = [
-            {"symbol": TRADE_PAIR_UP[:-4], "position": "up", "side": "BUY", "price": 0.5, "size": buy_size},
-            {"symbol": TRADE_PAIR_DOWN[:-4], "position": "down", "side": "BUY", "price": 0.5, "size": buy_size}
+            {**_ORDER_TEMPLATE[0], "size": buy_size},
+            {**_ORDER_TEMPLATE[1], "size": buy_size}
         ]
 
         await self.pm_trader.submit_limit_orders(order_args)
@@ -286,7 +358,7 @@ class PmTradingStrategy:
             f"2. {TRADE_PAIR_EXCHANGE}连续周期下跌\n"
             f"3. 当前15分钟周期剩余约2分钟\n"
             f"💰 余额: {buy_size} usdc"
-            f"⌛️ 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            f"⌛️ 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
         )
         self._trigger_custom_notification(notification_msg)
 
@@ -325,8 +397,14 @@ class BinanceWebSocketMonitor:
         self.pm_private_key = pm_private_key
         # 初始化k线记录器
         self.data_saver = KlineDataSaver(base_dir="./kline_data")
+        # k线写入队列，由后台任务消费，避免磁盘IO阻塞WebSocket接收
+        self._write_q: asyncio.Queue = asyncio.Queue(maxsize=1024)
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        # 共享的HTTP会话，保持长连接以复用TCP/TLS
+        self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=16, keepalive_timeout=300))
         # 初始化余额同步
-        self.balance_sync = USDCBalanceSync(wallet_address=self.pm_proxy_address,sync_interval=300)
+        self.balance_sync = USDCBalanceSync(wallet_address=self.pm_proxy_address, sync_interval=300,
+                                            http_session=self._http)
         # 初始化pm客户端
         self.pm_trader = PolymarketTrader(proxy_address=self.pm_proxy_address, private_key=self.pm_private_key,
                                           builder_api_key=builder_api_key, builder_secret=builder_secret,
@@ -367,13 +445,12 @@ class BinanceWebSocketMonitor:
                         # 解析K线数据[citation:4]
                         if data['e'] == 'kline':
                             symbol = data['s'].lower()
-                            self.strategy.update_data(symbol, data)
+                            # 价格字段只解析一次，供策略和日志共用
+                            parsed = _parse_kline(data['k'])
+                            self.strategy.update_data(symbol, data, parsed)
 
                             # 记录重要价格变动
-                            self._log_price_update(data)
-
-                    # 短暂睡眠避免CPU过载
-                    await asyncio.sleep(0.1)
+                            self._log_price_update(data, parsed)
 
                 except asyncio.CancelledError:
                     logger.info("监控任务被取消")
@@ -384,20 +461,45 @@ class BinanceWebSocketMonitor:
 
         await client.close_connection()
 
-    def _log_price_update(self, data: dict) -> None:
+    def _log_price_update(self, data: dict, parsed: tuple) -> None:
         """记录价格更新"""
         k = data['k']
         symbol = data['s']
 
         # 只记录K线闭合时的数据
         if k['x']:
+            open_price, close_price = parsed[0], parsed[1]
             logger.info(
                 f"{symbol} 15分钟K线闭合: "
                 f"开盘={k['o']}, 收盘={k['c']}, "
                 f"最高={k['h']}, 最低={k['l']}, "
-                f"涨跌={'📈' if float(k['c']) > float(k['o']) else '📉'}"
+                f"涨跌={'📈' if close_price > open_price else '📉'}"
             )
-            # 写入kline数据到文件 用于历史数据回测
+            # 写入kline数据到文件 用于历史数据回测（交给后台任务处理）
+            try:
+                self._write_q.put_nowait((symbol, k))
+            except asyncio.QueueFull:
+                logger.warning(f"k线写入队列已满，丢弃数据: {symbol} {k['t']}")
+
+    async def _writer_loop(self) -> None:
+        """后台写入任务：批量取出队列中的k线，在线程池中写入文件"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._write_q.get()
+            if item is None:  # 终止信号
+                break
+            batch = [item]
+            while not self._write_q.empty():
+                item = self._write_q.get_nowait()
+                if item is None:
+                    await loop.run_in_executor(None, self._save_batch, batch)
+                    return
+                batch.append(item)
+            await loop.run_in_executor(None, self._save_batch, batch)
+
+    def _save_batch(self, batch: list) -> None:
+        """写入一批k线数据"""
+        for symbol, k in batch:
             self.data_saver.save_kline(symbol, k)
 
     def stop(self) -> None:
@@ -405,9 +507,16 @@ class BinanceWebSocketMonitor:
         self.is_running = False
         logger.info("停止价格监控...")
 
-    def destroy(self) -> None:
+    async def destroy(self) -> None:
+        # 写完队列中剩余的k线后停止后台写入任务
+        if not self._writer_task.done():
+            await self._write_q.put(None)
+            await self._writer_task
         self.data_saver.close()  # 关闭文件流
         self.balance_sync.stop()  # 停止余额同步
+        await self._http.close()  # 关闭共享HTTP会话
+        await mailsender.close()  # 关闭复用的SMTP连接
+        await self.pm_trader.close()  # 关闭pm HTTP客户端
 
 
 async def main():
@@ -427,7 +536,7 @@ async def main():
         logger.error(f"程序运行出错: {e}")
         raise e
     finally:
-        monitor.destroy()
+        await monitor.destroy()
         logger.info("程序退出")
 
 
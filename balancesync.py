@@ -1,23 +1,34 @@
 import asyncio
+import functools
 import logging
-from web3 import Web3
-from web3.exceptions import ContractLogicError
+import aiohttp
+from eth_typing import ChecksumAddress
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3
+from web3.exceptions import ContractLogicError, ProviderConnectionError
 from typing import Optional
 
+
+@functools.lru_cache(maxsize=128)
+def _checksum(addr: str) -> ChecksumAddress:
+    """计算校验和地址（结果缓存，避免重复的keccak256计算）"""
+    return Web3.to_checksum_address(addr)
+
+
 class USDCBalanceSync:
     """
     一个用于异步定时同步Polygon链上USDC余额的类。
     """
 
     # Polygon 主网 USDC 合约地址 (官方)
-    USDC_CONTRACT_ADDRESS = Web3.to_checksum_address('0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174')
+    USDC_CONTRACT_ADDRESS = _checksum('0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174')
     # USDC ABI (精简版，仅包含balanceOf函数)[citation:1]
     USDC_ABI = '[{"constant":true,"inputs":[{"name":"_owner","type":"address"}],"name":"balanceOf","outputs":[{"name":"balance","type":"uint256"}],"type":"function"}]'
 
     def __init__(self,
                  wallet_address: str,
                  rpc_url: str = "https://polygon-rpc.com",
-                 sync_interval: int = 600):
+                 sync_interval: int = 600,
+                 http_session: Optional[aiohttp.ClientSession] = None):
         """
         初始化余额同步器。
 
@@ -25,17 +36,26 @@ class USDCBalanceSync:
             wallet_address: 要查询余额的钱包地址 (0x开头)。
             rpc_url: Polygon网络的RPC节点URL。默认使用公共节点，生产环境建议使用付费服务[citation:1]。
             sync_interval: 余额同步间隔时间（秒），默认600秒（10分钟）。
+            http_session: 共享的aiohttp会话（可选），异步RPC请求复用其连接池以保持长连接。
         """
-        self.wallet_address = Web3.to_checksum_address(wallet_address)
+        self.wallet_address = _checksum(wallet_address)
         self.rpc_url = rpc_url
         self.sync_interval = sync_interval
+        self._http_session = http_session
 
+        # 同步客户端仅用于事件循环启动前的初始查询
         self.web3 = Web3(Web3.HTTPProvider(self.rpc_url))
         # 创建USDC合约实例[citation:1]
         self.usdc_contract = self.web3.eth.contract(
             address=self.USDC_CONTRACT_ADDRESS,
             abi=self.USDC_ABI
         )
+        # 异步客户端用于定时同步，RPC请求期间不阻塞事件循环（首次查询时创建）
+        self.async_web3: Optional[AsyncWeb3] = None
+        # 钱包地址固定，balanceOf(address)的calldata预先编码一次：4字节选择器 + 左补零到32字节的地址
+        self._calldata_hex = '0x' + (Web3.keccak(text="balanceOf(address)")[:4]
+                                     + b'\x00' * 12
+                                     + bytes.fromhex(self.wallet_address[2:])).hex()
 
         self._latest_balance: Optional[float] = None  # 最新余额 (USDC单位)
         self._sync_task: Optional[asyncio.Task] = None  # 后台同步任务
@@ -46,45 +66,60 @@ class USDCBalanceSync:
     def _init_usdc_balance(self) -> Optional[float]:
         """查询一次链上USDC余额[citation:4]。"""
         try:
-            if not self.web3.is_connected():
+            try:
+                # 调用智能合约的balanceOf函数[citation:1]
+                balance_wei = self.usdc_contract.functions.balanceOf(self.wallet_address).call()
+            except (ProviderConnectionError, ConnectionError):
+                # 仅在实际请求失败时重连一次，不再每次预先探测连接
                 self._logger.warning("RPC连接断开，尝试重连...")
-                # 简单重连逻辑
                 self.web3 = Web3(Web3.HTTPProvider(self.rpc_url))
-                if not self.web3.is_connected():
-                    self._logger.error("无法重新连接到RPC节点。")
-                    return None
-
-            # 调用智能合约的balanceOf函数[citation:1]
-            balance_wei = self.usdc_contract.functions.balanceOf(self.wallet_address).call()
+                self.usdc_contract = self.web3.eth.contract(
+                    address=self.USDC_CONTRACT_ADDRESS,
+                    abi=self.USDC_ABI
+                )
+                balance_wei = self.usdc_contract.functions.balanceOf(self.wallet_address).call()
             # USDC有6位小数，进行转换
             balance_usdc = balance_wei / 1_000_000
             return balance_usdc
 
         except ContractLogicError as e:
             self._logger.error(f"合约调用失败: {e}")
+        except (ProviderConnectionError, ConnectionError) as e:
+            self._logger.error(f"无法重新连接到RPC节点: {e}")
         except Exception as e:
             self._logger.error(f"查询余额时发生未知错误: {e}")
         return None
 
+    async def _connect_async_web3(self) -> None:
+        """创建异步web3客户端，如提供了共享会话则复用其连接池。"""
+        provider = AsyncHTTPProvider(self.rpc_url)
+        if self._http_session is not None:
+            await provider.cache_async_session(self._http_session)
+        self.async_web3 = AsyncWeb3(provider)
+
     async def fetch_usdc_balance(self) -> Optional[float]:
         """查询一次链上USDC余额[citation:4]。"""
+        call_params = {'to': self.USDC_CONTRACT_ADDRESS, 'data': self._calldata_hex}
         try:
-            if not self.web3.is_connected():
+            if self.async_web3 is None:
+                await self._connect_async_web3()
+            try:
+                # 直接用预编码的calldata发起eth_call，跳过合约对象的ABI编码[citation:1]
+                raw = await self.async_web3.eth.call(call_params)
+            except (ProviderConnectionError, ConnectionError):
+                # 仅在实际请求失败时重连一次，不再每次预先探测连接
                 self._logger.warning("RPC连接断开，尝试重连...")
-                # 简单重连逻辑
-                self.web3 = Web3(Web3.HTTPProvider(self.rpc_url))
-                if not self.web3.is_connected():
-                    self._logger.error("无法重新连接到RPC节点。")
-                    return None
-
-            # 调用智能合约的balanceOf函数[citation:1]
-            balance_wei = self.usdc_contract.functions.balanceOf(self.wallet_address).call()
+                await self._connect_async_web3()
+                raw = await self.async_web3.eth.call(call_params)
+            balance_wei = int.from_bytes(raw, 'big')
             # USDC有6位小数，进行转换
             balance_usdc = balance_wei / 1_000_000
             return balance_usdc
 
         except ContractLogicError as e:
             self._logger.error(f"合约调用失败: {e}")
+        except (ProviderConnectionError, ConnectionError) as e:
+            self._logger.error(f"无法重新连接到RPC节点: {e}")
         except Exception as e:
             self._logger.error(f"查询余额时发生未知错误: {e}")
         return None
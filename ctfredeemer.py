@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import os
 import logging
 from typing import List, Optional
@@ -8,6 +10,12 @@ from py_builder_relayer_client.models import OperationType, SafeTransaction
 from py_builder_signing_sdk.config import BuilderConfig, BuilderApiKeyCreds
 
 
+@functools.lru_cache(maxsize=128)
+def _checksum(addr: str) -> ChecksumAddress:
+    """计算校验和地址（结果缓存，避免重复的keccak256计算）"""
+    return Web3.to_checksum_address(addr)
+
+
 class PolymarketCTFRedeemer:
     """
     使用Polymarket官方Relayer客户端赎回CTF仓位
@@ -15,7 +23,7 @@ class PolymarketCTFRedeemer:
     """
 
     # CTF合约地址 (Polygon主网)
-    CTF_ADDRESS = Web3.to_checksum_address("0x4D97DCd97eC945f40cF65F87097ACe5EA0476045")
+    CTF_ADDRESS = _checksum("0x4D97DCd97eC945f40cF65F87097ACe5EA0476045")
 
     # CTF合约ABI片段 (仅包含redeemPositions函数)
     CTF_ABI = [
@@ -60,6 +68,11 @@ class PolymarketCTFRedeemer:
 
         self.chain_id = 137  # Polygon主网
         self.w3 = Web3(Web3.HTTPProvider("https://polygon-rpc.com"))
+        # CTF合约实例只创建一次，赎回时直接复用
+        self._ctf_contract = self.w3.eth.contract(
+            address=self.CTF_ADDRESS,
+            abi=self.CTF_ABI
+        )
 
         self._validate_config()
         self.client = self._init_relay_client()
@@ -124,7 +137,7 @@ class PolymarketCTFRedeemer:
         """
         try:
             # 1. 准备参数
-            collateral_token_addr = Web3.to_checksum_address(collateral_token)
+            collateral_token_addr = _checksum(collateral_token)
             condition_id_bytes = HexStr(condition_id)
             parent_collection_id_bytes = HexStr(parent_collection_id)
 
@@ -137,12 +150,7 @@ class PolymarketCTFRedeemer:
             )
 
             # 2. 编码交易数据
-            ctf_contract = self.w3.eth.contract(
-                address=self.CTF_ADDRESS,
-                abi=self.CTF_ABI
-            )
-
-            transaction_data = ctf_contract.encode_abi(
+            transaction_data = self._ctf_contract.encode_abi(
                 abi_element_identifier="redeemPositions(address,bytes32,bytes32,uint256[])",
                 args=[
                     collateral_token_addr,
@@ -160,15 +168,17 @@ class PolymarketCTFRedeemer:
                 value="0",
             )
 
-            # 4. 通过Relayer执行交易
+            # 4. 通过Relayer执行交易并等待结果（Relayer客户端为同步阻塞调用，放到线程中执行，不阻塞事件循环）
             logging.info("通过Relayer提交交易...")
-            response = self.client.execute(
-                transactions=[redeem_tx],
-                metadata="Redeem position"
-            )
 
-            # 5. 等待交易结果
-            result = response.wait()
+            def execute_and_wait():
+                response = self.client.execute(
+                    transactions=[redeem_tx],
+                    metadata="Redeem position"
+                )
+                return response.wait()
+
+            result = await asyncio.to_thread(execute_and_wait)
 
             logging.info(f"✅ 赎回交易已提交！交易哈希: {result.transactionHash} 状态: {result.status}")
 
@@ -181,8 +191,7 @@ class PolymarketCTFRedeemer:
             }
 
         except Exception as e:
-            e.with_traceback()
-            logging.error(f"❌ 赎回失败: {str(e)}")
+            logging.exception(f"❌ 赎回失败: {str(e)}")
             return {
                 "success": False,
                 "error": str(e),
@@ -193,7 +202,9 @@ class PolymarketCTFRedeemer:
     async def get_transaction_status(self, transaction_hash: str) -> dict:
         """获取交易状态"""
         try:
-            receipt = self.w3.eth.wait_for_transaction_receipt(
+            # 同步等待回执，放到线程中执行避免阻塞事件循环
+            receipt = await asyncio.to_thread(
+                self.w3.eth.wait_for_transaction_receipt,
                 transaction_hash,
                 timeout=120,
                 poll_latency=2
@@ -1,15 +1,53 @@
 import gzip
-import json
+import os
+import threading
 import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass, asdict, is_dataclass
+from dataclasses import dataclass, is_dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from queue import Queue
 from typing import Dict, List, Optional, Any, Union
 import logging
 
-@dataclass
+import numpy as np
+import orjson
+import zstandard
+
+# 写入线程的落盘信号：写完此前入队的批次后执行一次同步
+_SYNC = object()
+# 写入线程的关闭文件信号：以 (_CLOSE, symbol, date_str) 入队，写完此前入队的批次后关闭该文件
+_CLOSE = object()
+
+SECS_PER_DAY = 86400
+MS_PER_DAY = SECS_PER_DAY * 1000
+
+# 向量写入（Windows上不可用，此时退回文件对象的整批写入）
+_WRITEV = getattr(os, 'writev', None)
+# 单次writev的最大缓冲区个数
+_IOV_MAX = min(os.sysconf('SC_IOV_MAX'), 1024) if _WRITEV is not None else 0
+
+
+def _writev_lines(fd: int, lines: List[bytes]):
+    """
+    将每行数据及其换行符直接作为缓冲区列表交给writev写入
+
+    无需先拼接出整批数据的大块bytes，系统调用期间释放GIL，不阻塞save_kline入队。
+    """
+    parts = []
+    for line in lines:
+        parts.append(line)
+        parts.append(b'\n')
+    for start in range(0, len(parts), _IOV_MAX):
+        chunk = parts[start:start + _IOV_MAX]
+        written = _WRITEV(fd, chunk)
+        # 发生部分写入时，剩余部分拼接后补写
+        if written < sum(map(len, chunk)):
+            rest = memoryview(b''.join(chunk))[written:]
+            while rest:
+                rest = rest[os.write(fd, rest):]
+
+@dataclass(slots=True)
 class KlineData:
     """K线数据结构"""
     symbol: str
@@ -48,6 +86,58 @@ class KlineData:
             ignore=float(k['B']) if 'B' in k else 0.0
         )
 
+class _SpscBatchRing:
+    """
+    单生产者/单消费者的有界批次队列
+
+    deque的append/popleft在GIL下是原子操作，生产者与消费者之间不需要互斥锁，
+    只在队列空/满时通过Event等待唤醒。
+    """
+
+    def __init__(self, capacity: int):
+        self._items = deque()
+        self._capacity = capacity
+        self._not_empty = threading.Event()
+        self._not_full = threading.Event()
+        self._not_full.set()
+
+    def put(self, item) -> None:
+        """放入一个批次，队列满时阻塞等待"""
+        while len(self._items) >= self._capacity:
+            self._not_full.clear()
+            # 清除标志后再检查一次，避免错过消费者的唤醒
+            if len(self._items) >= self._capacity:
+                self._not_full.wait()
+        self._items.append(item)
+        self._not_empty.set()
+
+    def get(self):
+        """取出一个批次，队列空时阻塞等待"""
+        while True:
+            try:
+                item = self._items.popleft()
+            except IndexError:
+                self._not_empty.clear()
+                # 清除标志后再检查一次，避免错过生产者的唤醒
+                if not self._items:
+                    self._not_empty.wait()
+                continue
+            self._not_full.set()
+            return item
+
+    def drain(self) -> list:
+        """非阻塞地取出当前队列中的全部批次"""
+        items = []
+        while True:
+            try:
+                items.append(self._items.popleft())
+            except IndexError:
+                break
+        if items:
+            self._not_full.set()
+        return items
+
+
 class KlineDataSaver:
     """K线数据保存器，支持按日期和交易对自动分文件存储"""
 
@@ -64,9 +154,9 @@ class KlineDataSaver:
 
         Args:
             base_dir: 数据存储根目录
-            compress: 是否使用gzip压缩
+            compress: 是否使用zstd压缩
             buffer_size: 缓冲区大小，达到此数量后自动写入
-            flush_interval: 自动刷新间隔（秒）
+            flush_interval: 自动刷新间隔（秒），同时也是落盘间隔，即异常退出时最多丢失该时长内的数据
             use_threading: 是否使用多线程异步写入
         """
         self.base_dir = Path(base_dir)
@@ -77,97 +167,190 @@ class KlineDataSaver:
 
         # 创建基础目录
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        # 已确认存在的数据目录，避免每次获取文件路径都调用mkdir
+        self._ensured_dirs: set = set()
+        # 日期字符串缓存：{自1970-01-01起的UTC天数: 日期字符串}
+        self._day_cache: Dict[int, str] = {}
 
         # 数据缓冲区：{(symbol, date_str): [kline_data]}
-        self.buffers: Dict[str, List[Dict]] = {}
-
-        # 当前打开的文件句柄
-        self.file_handles: Dict[str, Any] = {}
+        self.buffers: Dict[tuple, List[Dict]] = {}
+
+        # 当前打开的文件句柄：{(symbol, date_str): 文件句柄}
+        self.file_handles: Dict[tuple, Any] = {}
+        # 每个交易对当前写入的日期：{symbol: date_str}，由save_kline所在线程维护，用于判断日期切换
+        self._symbol_dates: Dict[str, str] = {}
+        # 写入热路径用：{file_key: (文件句柄, 文件状态记录)}，一次查找即可拿到两者
+        self._open_entries: Dict[tuple, tuple] = {}
+        # 上次落盘后写入过数据的文件：{fd: 文件句柄}，落盘时在锁内整体换出后统一同步
+        self._dirty_fds: Dict[int, Any] = {}
+        self._dirty_lock = threading.Lock()
 
         # 最后刷新时间
         self.last_flush_time = time.time()
 
         # 异步写入队列和线程池
         if self.use_threading:
-            self.write_queue = Queue(maxsize=1000)
+            # 每次入队的是一个(symbol, date)批次，容量无需太大
+            self.write_queue = _SpscBatchRing(capacity=64)
             self.thread_pool = ThreadPoolExecutor(max_workers=2)
             self._start_writer_thread()
 
-        # 文件状态记录
+        # 文件状态记录：{(symbol, date_str): 状态}
+        # 持久化为快照 file_status.json + 追加写入的变更日志 file_status.log（NDJSON），启动时回放日志
         self.file_status_path = self.base_dir / "file_status.json"
+        self.status_log_path = self.base_dir / "file_status.log"
+        self._status_lock = threading.Lock()
         self.file_status = self._load_file_status()
+        self._snapshot_size = self.file_status_path.stat().st_size if self.file_status_path.exists() else 0
+        self._status_log = open(self.status_log_path, 'ab', buffering=0)
+        self._status_log_size = self._status_log.tell()
+        if self._status_log_size > self._compact_threshold():
+            self._save_file_status()
 
         logging.info(f"K线数据保存器初始化完成，数据目录: {self.base_dir}")
 
+    @staticmethod
+    def _parse_status_key(key: str) -> tuple:
+        """解析持久化的文件状态键 "symbol|date_str"（兼容旧格式 "symbol_date_str"）"""
+        if '|' in key:
+            return tuple(key.split('|', 1))
+        return tuple(key.rsplit('_', 1))
+
     def _load_file_status(self) -> Dict:
-        """加载文件状态记录"""
+        """加载文件状态记录（读取快照后回放变更日志）"""
+        file_status = {}
         if self.file_status_path.exists():
             try:
-                with open(self.file_status_path, 'r') as f:
-                    return json.load(f)
+                with open(self.file_status_path, 'rb') as f:
+                    raw = orjson.loads(f.read())
+                file_status = {self._parse_status_key(key): status for key, status in raw.items()}
             except:
-                return {}
-        return {}
+                file_status = {}
+
+        if self.status_log_path.exists():
+            try:
+                with open(self.status_log_path, 'rb') as f:
+                    data = f.read()
+                # 异常退出时最后一行可能不完整：截断到最后一个换行符，避免之后追加的记录拼接到残行上
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    os.truncate(self.status_log_path, end)
+                for line in data[:end].splitlines():
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue
+                    file_status[self._parse_status_key(record['k'])] = record['v']
+            except Exception as e:
+                logging.error(f"回放文件状态日志失败: {e}")
+        return file_status
+
+    def _compact_threshold(self) -> int:
+        """变更日志超过快照大小的10倍时压缩（快照很小时至少积累1MB再压缩）"""
+        return max(self._snapshot_size * 10, 1 << 20)
+
+    def _log_file_status(self, file_key: tuple, status: Dict):
+        """追加一条文件状态变更到日志，只写入变化的记录而不是整个状态表"""
+        symbol, date_str = file_key
+        line = orjson.dumps({'k': f"{symbol}|{date_str}", 'v': status}) + b'\n'
+        try:
+            with self._status_lock:
+                self._status_log.write(line)
+                self._status_log_size += len(line)
+            if self._status_log_size > self._compact_threshold():
+                self._save_file_status()
+        except Exception as e:
+            logging.error(f"记录文件状态失败 {symbol}_{date_str}: {e}")
 
     def _save_file_status(self):
-        """保存文件状态记录"""
+        """保存文件状态快照，并清空已合并进快照的变更日志"""
         try:
-            with open(self.file_status_path, 'w') as f:
-                json.dump(self.file_status, f, indent=2)
+            with self._status_lock:
+                # 元组键序列化为 "symbol|date_str"（'|'不会出现在交易对名称中）
+                raw = {f"{symbol}|{date_str}": status
+                       for (symbol, date_str), status in list(self.file_status.items())}
+                payload = orjson.dumps(raw)
+                # 先完整写出新快照并落盘后再替换，最后才清空日志；中途退出时回放日志结果不变
+                tmp_path = self.file_status_path.with_suffix('.json.tmp')
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.file_status_path)
+                if hasattr(os, 'O_DIRECTORY'):
+                    # 同步目录项，确保替换后的快照在清空日志前已持久化（Windows不支持）
+                    dir_fd = os.open(self.base_dir, os.O_RDONLY | os.O_DIRECTORY)
+                    try:
+                        os.fsync(dir_fd)
+                    finally:
+                        os.close(dir_fd)
+                self._snapshot_size = len(payload)
+                self._status_log.truncate(0)
+                self._status_log_size = 0
         except Exception as e:
             logging.error(f"保存文件状态失败: {e}")
 
     def _get_date_str(self, timestamp_ms: int) -> str:
-        """将时间戳转换为日期字符串"""
-        dt = datetime.fromtimestamp(timestamp_ms / 1000)
-        return dt.strftime("%Y-%m-%d")
+        """将毫秒时间戳转换为UTC日期字符串（与币安K线的日界对齐）"""
+        days = timestamp_ms // MS_PER_DAY
+        date_str = self._day_cache.get(days)
+        if date_str is None:
+            # 每天只格式化一次，缓存只保留最近的若干天
+            if len(self._day_cache) >= 32:
+                del self._day_cache[next(iter(self._day_cache))]
+            date_str = time.strftime("%Y-%m-%d", time.gmtime(days * SECS_PER_DAY))
+            self._day_cache[days] = date_str
+        return date_str
 
     def _get_file_path(self, symbol: str, date_str: str) -> Path:
         """获取文件路径"""
-        # 按交易对创建子目录
-        symbol_dir = self.base_dir / symbol
-        symbol_dir.mkdir(exist_ok=True)
-
-        # 按时间周期创建子目录
-        interval_dir = symbol_dir / "15m"  # 固定为15分钟周期
-        interval_dir.mkdir(exist_ok=True)
+        # 按交易对/时间周期创建子目录（固定为15分钟周期），每个目录只创建一次
+        interval_dir = f"{self.base_dir}/{symbol}/15m"
+        if interval_dir not in self._ensured_dirs:
+            os.makedirs(interval_dir, exist_ok=True)
+            self._ensured_dirs.add(interval_dir)
 
         # 文件名
-        filename = f"{symbol}_15m_{date_str}"
-        if self.compress:
-            filename += ".json.gz"
-        else:
-            filename += ".json"
-
-        return interval_dir / filename
-
-    def _open_file(self, symbol: str, date_str: str, mode: str = 'a'):
-        """打开文件，返回文件句柄"""
-        file_path = self._get_file_path(symbol, date_str)
+        suffix = ".json.zst" if self.compress else ".json"
+        return Path(f"{interval_dir}/{symbol}_15m_{date_str}{suffix}")
 
+    def _open_file(self, symbol: str, date_str: str, mode: str = 'ab', now_iso: Optional[str] = None):
+        """打开文件，返回文件句柄（now_iso为新建文件状态记录时使用的创建时间，默认取当前时间）"""
         # 检查文件是否已经打开
-        file_key = f"{symbol}_{date_str}"
+        file_key = (symbol, date_str)
         if file_key in self.file_handles:
             return self.file_handles[file_key]
 
+        file_path = self._get_file_path(symbol, date_str)
+
         # 打开新文件
         try:
+            # 以二进制模式打开，直接写入orjson序列化后的bytes
             if self.compress:
-                f = gzip.open(file_path, mode + 't', encoding='utf-8')
+                # zstd流式压缩，追加写入时每次打开产生一个新的zstd帧
+                # 每个文件一个压缩器且批次很小，不开启多线程压缩
+                f = zstandard.ZstdCompressor(level=3, threads=0).stream_writer(open(file_path, mode))
+            elif _WRITEV is not None:
+                # 不经过Python层缓冲，批量数据由writev直接写入文件描述符
+                f = open(file_path, mode, buffering=0)
             else:
-                f = open(file_path, mode, encoding='utf-8')
+                f = open(file_path, mode)
 
             self.file_handles[file_key] = f
 
             # 记录文件状态
             if file_key not in self.file_status:
+                if now_iso is None:
+                    now_iso = datetime.now().isoformat()
                 self.file_status[file_key] = {
                     'symbol': symbol,
                     'date': date_str,
-                    'created_at': datetime.now().isoformat(),
-                    'last_updated': datetime.now().isoformat(),
+                    'created_at': now_iso,
+                    'last_updated': now_iso,
                     'line_count': 0
                 }
+                self._log_file_status(file_key, self.file_status[file_key])
+            self._open_entries[file_key] = (f, self.file_status[file_key])
 
             logging.debug(f"打开文件: {file_path}")
             return f
@@ -178,10 +361,15 @@ class KlineDataSaver:
 
     def _close_file(self, symbol: str, date_str: str):
         """关闭文件"""
-        file_key = f"{symbol}_{date_str}"
+        file_key = (symbol, date_str)
         if file_key in self.file_handles:
             try:
-                self.file_handles[file_key].close()
+                self._open_entries.pop(file_key, None)
+                f = self.file_handles[file_key]
+                # 在锁内移出待落盘集合并关闭，与定期同步互斥，同步时不会遇到已关闭的文件
+                with self._dirty_lock:
+                    self._dirty_fds.pop(f.fileno(), None)
+                    f.close()
                 del self.file_handles[file_key]
                 logging.debug(f"关闭文件: {symbol}_{date_str}")
             except Exception as e:
@@ -189,23 +377,44 @@ class KlineDataSaver:
 
     def _close_all_files(self):
         """关闭所有打开的文件"""
-        for file_key in list(self.file_handles.keys()):
-            symbol, date_str = file_key.split('_', 1)
+        for symbol, date_str in list(self.file_handles.keys()):
             self._close_file(symbol, date_str)
 
     def _start_writer_thread(self):
         """启动写入线程"""
 
         def writer_worker():
-            while True:
+            running = True
+            while running:
                 try:
-                    data = self.write_queue.get()
-                    if data is None:  # 终止信号
-                        break
-
-                    symbol, kline_data, date_str = data
-                    self._write_single_kline(symbol, kline_data, date_str)
-                    self.write_queue.task_done()
+                    # 取出当前所有就绪的批次，按文件合并后每个文件只写一次
+                    pending = [self.write_queue.get()]
+                    pending.extend(self.write_queue.drain())
+
+                    # 每批次只取一次时间戳，而不是每次写入都生成
+                    updated_at = datetime.now().isoformat()
+                    merged: Dict[tuple, List] = {}
+                    need_sync = False
+                    for data in pending:
+                        if data is None:  # 终止信号（写完之前入队的数据后退出）
+                            running = False
+                            break
+                        if data is _SYNC:
+                            need_sync = True
+                            continue
+                        if data[0] is _CLOSE:
+                            # 文件句柄只由写入线程关闭：先写完已合并的数据，再关闭文件
+                            self._write_merged(merged, updated_at)
+                            merged = {}
+                            self._close_file(data[1], data[2])
+                            continue
+                        symbol, kline_list, date_str = data
+                        merged.setdefault((symbol, date_str), []).extend(kline_list)
+
+                    self._write_merged(merged, updated_at)
+
+                    if need_sync:
+                        self._periodic_sync()
 
                 except Exception as e:
                     logging.error(f"写入线程错误: {e}")
@@ -214,38 +423,51 @@ class KlineDataSaver:
         self.thread_pool.submit(writer_worker)
         logging.info("启动异步写入线程")
 
-    def _write_single_kline(self, symbol: str, kline_data: Union[Dict, KlineData], date_str: str):
-        """写入单条K线数据"""
-        try:
-            # 打开文件
-            f = self._open_file(symbol, date_str)
+    def _write_merged(self, merged: Dict[tuple, List], updated_at: str):
+        """将按文件合并后的批次逐个文件写入"""
+        for (symbol, date_str), kline_list in merged.items():
+            self._write_batch(symbol, kline_list, date_str, updated_at)
 
-            # 转换为JSON字符串
-            if is_dataclass(kline_data):
-                data_dict = asdict(kline_data)
+    def _write_batch(self, symbol: str, kline_list: List[Union[Dict, KlineData]], date_str: str,
+                     updated_at: str):
+        """批量写入K线数据（整批序列化后一次write）"""
+        try:
+            # 获取文件句柄和状态记录（未打开时先打开文件）
+            file_key = (symbol, date_str)
+            entry = self._open_entries.get(file_key)
+            if entry is None:
+                # 与本批次使用同一时间戳，保证新文件的created_at不晚于last_updated
+                self._open_file(symbol, date_str, now_iso=updated_at)
+                entry = self._open_entries[file_key]
+            f, status = entry
+
+            # 序列化为JSON（orjson原生支持dataclass，无需asdict），每行一个JSON对象
+            lines = [orjson.dumps(kline) for kline in kline_list]
+
+            # 一次写入整批数据，由OS页缓存和定期刷新负责落盘
+            if self.compress or _WRITEV is None:
+                f.write(b'\n'.join(lines) + b'\n')
             else:
-                data_dict = kline_data
-
-            json_str = json.dumps(data_dict, ensure_ascii=False)
+                _writev_lines(f.fileno(), lines)
 
-            # 写入文件（每行一个JSON对象）
-            f.write(json_str + '\n')
-            f.flush()  # 确保数据立即写入磁盘
+            # 只标记待落盘，由定期同步统一执行fdatasync
+            with self._dirty_lock:
+                self._dirty_fds[f.fileno()] = f
 
             # 更新文件状态
-            file_key = f"{symbol}_{date_str}"
-            if file_key in self.file_status:
-                self.file_status[file_key]['line_count'] += 1
-                self.file_status[file_key]['last_updated'] = datetime.now().isoformat()
+            status['line_count'] += len(kline_list)
+            status['last_updated'] = updated_at
+            self._log_file_status(file_key, status)
 
-            logging.debug(f"写入数据: {symbol} | {date_str} | 开盘: {data_dict.get('open')}")
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug(f"写入数据: {symbol} | {date_str} | 条数: {len(kline_list)}")
 
         except Exception as e:
             logging.error(f"写入数据失败 {symbol}_{date_str}: {e}")
 
     def _buffer_kline(self, symbol: str, kline_data: Dict, date_str: str):
         """缓冲K线数据"""
-        buffer_key = f"{symbol}_{date_str}"
+        buffer_key = (symbol, date_str)
 
         if buffer_key not in self.buffers:
             self.buffers[buffer_key] = []
@@ -256,23 +478,21 @@ class KlineDataSaver:
         if len(self.buffers[buffer_key]) >= self.buffer_size:
             self.flush_buffer(buffer_key)
 
-    def flush_buffer(self, buffer_key: Optional[str] = None):
+    def flush_buffer(self, buffer_key: Optional[tuple] = None):
         """刷新缓冲区到文件"""
         try:
             if buffer_key:
                 # 刷新指定缓冲区
                 if buffer_key in self.buffers and self.buffers[buffer_key]:
                     klines = self.buffers[buffer_key]
-                    symbol, date_str = buffer_key.split('_', 1)
+                    symbol, date_str = buffer_key
 
                     if self.use_threading:
-                        # 异步写入
-                        for kline in klines:
-                            self.write_queue.put((symbol, kline, date_str))
+                        # 异步写入（整批入队）
+                        self.write_queue.put((symbol, klines, date_str))
                     else:
                         # 同步写入
-                        for kline in klines:
-                            self._write_single_kline(symbol, kline, date_str)
+                        self._write_batch(symbol, klines, date_str, datetime.now().isoformat())
 
                     # 清空缓冲区
                     self.buffers[buffer_key] = []
@@ -315,6 +535,11 @@ class KlineDataSaver:
             current_time = time.time()
             if current_time - self.last_flush_time > self.flush_interval:
                 self.flush_buffer()
+                # 落盘由持有文件句柄的写入线程在写完上述数据后执行
+                if self.use_threading:
+                    self.write_queue.put(_SYNC)
+                else:
+                    self._periodic_sync()
                 self.last_flush_time = current_time
 
             return True
@@ -323,23 +548,40 @@ class KlineDataSaver:
             logging.error(f"保存K线数据失败: {e}")
             return False
 
+    def _periodic_sync(self):
+        """将上次同步后写入过的文件同步到磁盘（仅追加写入，fdatasync即可，无需同步元数据）"""
+        sync = getattr(os, 'fdatasync', os.fsync)
+        # 换出待落盘集合，同步次数只与写入过的文件数有关，未写入的文件不再重复同步
+        # 同步期间持有锁，文件不会在同步过程中被关闭
+        with self._dirty_lock:
+            dirty, self._dirty_fds = self._dirty_fds, {}
+            for fd, f in dirty.items():
+                try:
+                    if self.compress:
+                        # zstd只刷出当前块，不结束压缩帧
+                        f.flush(zstandard.FLUSH_BLOCK)
+                    else:
+                        f.flush()
+                        sync(fd)
+                except Exception as e:
+                    logging.error(f"同步文件失败 fd={fd}: {e}")
+
     def _check_and_switch_files(self, symbol: str, current_date_str: str):
         """检查并切换文件（如果日期变化）"""
-        # 检查是否有旧日期的文件需要关闭
-        for file_key in list(self.file_handles.keys()):
-            if file_key.startswith(f"{symbol}_") and not file_key.endswith(f"_{current_date_str}"):
-                # 提取日期部分
-                old_date_str = file_key.split('_', 1)[1]
-
-                # 关闭旧文件
-                self._close_file(symbol, old_date_str)
+        old_date_str = self._symbol_dates.get(symbol)
+        self._symbol_dates[symbol] = current_date_str
+        if old_date_str is None or old_date_str == current_date_str:
+            return
 
-                # 刷新对应的缓冲区
-                buffer_key = f"{symbol}_{old_date_str}"
-                if buffer_key in self.buffers:
-                    self.flush_buffer(buffer_key)
+        # 先把旧日期的缓冲区刷出，再关闭旧文件，避免关闭后又被重新打开
+        self.flush_buffer((symbol, old_date_str))
+        if self.use_threading:
+            # 文件句柄归写入线程所有，由其写完此前入队的数据后关闭
+            self.write_queue.put((_CLOSE, symbol, old_date_str))
+        else:
+            self._close_file(symbol, old_date_str)
 
-                logging.info(f"日期变化，关闭旧文件: {symbol}_{old_date_str}")
+        logging.info(f"日期变化，关闭旧文件: {symbol}_{old_date_str}")
 
     def batch_save(self, symbol: str, klines: List[Union[Dict, KlineData]]):
         """批量保存K线数据"""
@@ -358,8 +600,7 @@ class KlineDataSaver:
         """获取文件信息"""
         info_list = []
 
-        for file_key, status in self.file_status.items():
-            file_symbol, file_date = file_key.split('_', 1)
+        for (file_symbol, file_date), status in self.file_status.items():
 
             if symbol and file_symbol != symbol:
                 continue
@@ -383,6 +624,33 @@ class KlineDataSaver:
 
         return info_list
 
+    def write_columnar(self, symbol: str, date_str: str) -> int:
+        """
+        将一整天的K线数据按列写出，供回测只读取需要的字段
+
+        每个字段写为一个zstd压缩的NDJSON文件（每行一个值）：
+        {base_dir}/{symbol}/15m/columns/{date_str}/{field}.json.zst
+        应在该日期的文件写完（日期切换或close）之后调用。
+
+        Returns:
+            写出的行数
+        """
+        rows = BacktestDataLoader.load_kline_data(symbol, date_str, str(self.base_dir))
+        if not rows:
+            return 0
+
+        column_dir = self.base_dir / symbol / "15m" / "columns" / date_str
+        column_dir.mkdir(parents=True, exist_ok=True)
+
+        compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+        for field_name in rows[0].keys():
+            payload = b'\n'.join(orjson.dumps(row.get(field_name)) for row in rows) + b'\n'
+            with open(column_dir / f"{field_name}.json.zst", 'wb') as f:
+                f.write(compressor.compress(payload))
+
+        logging.info(f"按列写出完成: {symbol} | {date_str} | 条数: {len(rows)}")
+        return len(rows)
+
     def cleanup_old_files(self, days_to_keep: int = 30):
         """清理旧文件"""
         try:
@@ -418,20 +686,56 @@ class KlineDataSaver:
         # 刷新所有缓冲区
         self.flush_buffer()
 
-        # 关闭所有文件
-        self._close_all_files()
-
-        # 停止写入线程
+        # 停止写入线程（等待队列中的数据写完后再关闭文件）
         if self.use_threading:
             self.write_queue.put(None)  # 发送终止信号
             self.thread_pool.shutdown(wait=True)
 
+        # 关闭所有文件
+        self._close_all_files()
+
         # 保存文件状态
         self._save_file_status()
+        self._status_log.close()
 
         logging.info("K线数据保存器已关闭")
 
 
+# 回测用的numpy结构化数组字段
+KLINE_NP_DTYPE = np.dtype([
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+])
+
+
+def _kline_record_to_row(record: Dict) -> tuple:
+    """
+    将保存的K线记录转换为 KLINE_NP_DTYPE 的一行
+
+    兼容币安原始字段（t/o/c...）、本模块KlineData字段（open/close）
+    以及策略KlineData字段（open_price/close_price）。
+    """
+    if 'open_time' in record:
+        if 'open_price' in record:
+            return (record['open_time'], record['open_price'], record['high'],
+                    record['low'], record['close_price'], record['volume'])
+        return (record['open_time'], record['open'], record['high'],
+                record['low'], record['close'], record['volume'])
+    return (record['t'], float(record['o']), float(record['h']),
+            float(record['l']), float(record['c']), float(record['v']))
+
+
+def _kline_record_is_closed(record: Dict) -> bool:
+    """K线记录是否已闭合（没有闭合标记的记录视为已闭合，同一开盘时间以最后一条为准）"""
+    if 'x' in record:
+        return record['x']
+    return record.get('is_closed', True)
+
+
 # 用于回测的数据加载器
 class BacktestDataLoader:
     """回测数据加载器"""
@@ -440,22 +744,30 @@ class BacktestDataLoader:
     def load_kline_data(symbol: str, date_str: str, base_dir: str = "./kline_data") -> List[Dict]:
         """加载指定交易对和日期的K线数据"""
         file_path = Path(base_dir) / symbol / "15m" / f"{symbol}_15m_{date_str}.json"
+        zst_path = file_path.with_suffix('.json.zst')
         gz_path = file_path.with_suffix('.json.gz')
 
         data = []
         try:
-            if gz_path.exists():
+            if zst_path.exists():
+                # 加载zstd压缩文件（追加写入会产生多个帧）
+                with open(zst_path, 'rb') as f:
+                    reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                    for line in reader.read().splitlines():
+                        if line.strip():
+                            data.append(orjson.loads(line))
+            elif gz_path.exists():
                 # 加载gzip压缩文件
-                with gzip.open(gz_path, 'rt', encoding='utf-8') as f:
+                with gzip.open(gz_path, 'rb') as f:
                     for line in f:
                         if line.strip():
-                            data.append(json.loads(line))
+                            data.append(orjson.loads(line))
             elif file_path.exists():
                 # 加载普通JSON文件
-                with open(file_path, 'r', encoding='utf-8') as f:
+                with open(file_path, 'rb') as f:
                     for line in f:
                         if line.strip():
-                            data.append(json.loads(line))
+                            data.append(orjson.loads(line))
             else:
                 logging.warning(f"文件不存在: {file_path}")
 
@@ -465,22 +777,57 @@ class BacktestDataLoader:
         logging.info(f"加载数据: {symbol} | {date_str} | 条数: {len(data)}")
         return data
 
+    @staticmethod
+    def load_columns(symbol: str, date_str: str, fields: List[str],
+                     base_dir: str = "./kline_data") -> Dict[str, List]:
+        """加载 write_columnar 写出的指定列"""
+        column_dir = Path(base_dir) / symbol / "15m" / "columns" / date_str
+        decompressor = zstandard.ZstdDecompressor()
+
+        columns = {}
+        try:
+            for field_name in fields:
+                with open(column_dir / f"{field_name}.json.zst", 'rb') as f:
+                    payload = decompressor.stream_reader(f).read()
+                columns[field_name] = [orjson.loads(line) for line in payload.splitlines() if line]
+        except Exception as e:
+            logging.error(f"加载列数据失败: {e}")
+
+        return columns
+
     @staticmethod
     def load_date_range(symbol: str, start_date: str, end_date: str,
                         base_dir: str = "./kline_data") -> List[Dict]:
-        """加载日期范围内的数据"""
-        all_data = []
+        """加载日期范围内的数据（每日文件按时间顺序追加写入，按日期顺序拼接即有序）"""
+        date_strs = []
         current_date = datetime.strptime(start_date, "%Y-%m-%d")
         end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
 
         while current_date <= end_date_obj:
-            date_str = current_date.strftime("%Y-%m-%d")
-            daily_data = BacktestDataLoader.load_kline_data(symbol, date_str, base_dir)
-            all_data.extend(daily_data)
+            date_strs.append(current_date.strftime("%Y-%m-%d"))
             current_date += timedelta(days=1)
 
-        # 按时间排序
-        all_data.sort(key=lambda x: x['open_time'])
+        # 多线程并行读取解压/解析各天数据，map保持日期顺序
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            daily_list = list(executor.map(
+                lambda date_str: BacktestDataLoader.load_kline_data(symbol, date_str, base_dir), date_strs))
+
+        all_data = []
+        for daily_data in daily_list:
+            if daily_data and all_data and logging.root.isEnabledFor(logging.DEBUG):
+                prev_time = all_data[-1].get('open_time', all_data[-1].get('t'))
+                head_time = daily_data[0].get('open_time', daily_data[0].get('t'))
+                if head_time < prev_time:
+                    logging.debug(f"数据时间不连续: {symbol} | {head_time} < {prev_time}")
+            all_data.extend(daily_data)
 
         logging.info(f"加载日期范围数据: {symbol} | {start_date} 到 {end_date} | 总条数: {len(all_data)}")
         return all_data
+
+    @staticmethod
+    def load_date_range_np(symbol: str, start_date: str, end_date: str,
+                           base_dir: str = "./kline_data") -> np.ndarray:
+        """加载日期范围内的数据为numpy结构化数组（字段见 KLINE_NP_DTYPE）"""
+        records = BacktestDataLoader.load_date_range(symbol, start_date, end_date, base_dir)
+        return np.fromiter((_kline_record_to_row(record) for record in records),
+                           dtype=KLINE_NP_DTYPE, count=len(records))
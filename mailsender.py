@@ -19,6 +19,77 @@ SEND_MAIL_USERNAME = os.environ.get("SEND_MAIL_USERNAME")
 SEND_MAIL_PASSWORD = os.environ.get("SEND_MAIL_PASSWORD")  # 使用专用密码或授权码
 SEND_MAIL_RECIPIENTS = os.environ.get("SEND_MAIL_RECIPIENTS").split(",")
 
+# 复用的SMTP连接：首次发送时建立，之后保持长连接，避免每封邮件都重新握手和认证
+SMTP_KEEPALIVE_INTERVAL = 60  # 保活NOOP间隔（秒）
+_smtp: Optional[aiosmtplib.SMTP] = None
+_smtp_lock = asyncio.Lock()
+_keepalive_handle: Optional[asyncio.TimerHandle] = None
+_keepalive_task: Optional[asyncio.Task] = None
+
+
+async def _connect(smtp_server: str, smtp_port: int, username: str, password: str,
+                   use_tls: bool) -> aiosmtplib.SMTP:
+    """建立SMTP连接并登录"""
+    smtp = aiosmtplib.SMTP(
+        hostname=smtp_server,
+        port=smtp_port,
+        use_tls=use_tls
+    )
+
+    await smtp.connect()
+
+    # 如果使用TLS，需要启动TLS加密
+    if use_tls and smtp_port == 587:
+        await smtp.starttls()
+
+    # 登录到邮件服务器
+    await smtp.login(username, password)
+    return smtp
+
+
+def _schedule_keepalive() -> None:
+    """（重新）安排下一次保活NOOP"""
+    global _keepalive_handle
+    if _keepalive_handle:
+        _keepalive_handle.cancel()
+    _keepalive_handle = asyncio.get_running_loop().call_later(SMTP_KEEPALIVE_INTERVAL, _start_keepalive)
+
+
+def _start_keepalive() -> None:
+    """定时器回调：启动保活任务"""
+    global _keepalive_task
+    _keepalive_task = asyncio.create_task(_keepalive())
+
+
+async def _keepalive() -> None:
+    """发送NOOP防止服务器因空闲断开连接"""
+    global _smtp
+    async with _smtp_lock:
+        if _smtp is None or not _smtp.is_connected:
+            return
+        try:
+            await _smtp.noop()
+        except aiosmtplib.SMTPException as e:
+            logging.warning(f"SMTP保活失败，下次发送时重连: {e}")
+            _smtp = None
+            return
+    _schedule_keepalive()
+
+
+async def close() -> None:
+    """关闭复用的SMTP连接"""
+    global _smtp
+    if _keepalive_handle:
+        _keepalive_handle.cancel()
+    async with _smtp_lock:
+        if _smtp is not None and _smtp.is_connected:
+            try:
+                await _smtp.quit()
+            except aiosmtplib.SMTPException as e:
+                logging.warning(f"关闭SMTP连接失败: {e}")
+        _smtp = None
+
+
 async def send(
         sender: str,
         recipients: List[str],
@@ -49,6 +120,7 @@ async def send(
     Returns:
         bool: 发送成功返回True，失败返回False
     """
+    global _smtp
     try:
         # 1. 创建邮件消息
         if html_body:
@@ -65,31 +137,26 @@ async def send(
         message['To'] = ', '.join(recipients)  # 多个收件人用逗号分隔
         message['Subject'] = subject
 
-        # 3. 连接SMTP服务器并发送
-        smtp = aiosmtplib.SMTP(
-            hostname=smtp_server,
-            port=smtp_port,
-            use_tls=use_tls
-        )
-
-        await smtp.connect()
-
-        # 如果使用TLS，需要启动TLS加密
-        if use_tls and smtp_port == 587:
-            await smtp.starttls()
-
-        # 登录到邮件服务器
-        await smtp.login(username, password)
-
-        # 发送邮件
-        await smtp.sendmail(
-            sender,
-            recipients,
-            message.as_string()
-        )
-
-        # 退出连接
-        await smtp.quit()
+        # 3. 复用SMTP连接发送（未连接时建立连接，连接被服务器断开时重连一次）
+        async with _smtp_lock:
+            for attempt in range(2):
+                try:
+                    if _smtp is None or not _smtp.is_connected:
+                        _smtp = await _connect(smtp_server, smtp_port, username, password, use_tls)
+
+                    # 发送邮件
+                    await _smtp.sendmail(
+                        sender,
+                        recipients,
+                        message.as_string()
+                    )
+                    break
+                except aiosmtplib.SMTPServerDisconnected:
+                    _smtp = None
+                    if attempt:
+                        raise
+                    logging.warning("SMTP连接已断开，正在重连...")
+        _schedule_keepalive()
 
         logging.info(f"邮件发送成功！收件人: {', '.join(recipients)}")
         return True
@@ -125,5 +192,10 @@ async def send_email_async(subject, body):
 
 
 # 运行示例
+async def _main():
+    await send_email_async('测试邮件主题', '这是一封测试邮件的正文内容。')
+    await close()
+
+
 if __name__ == "__main__":
-    asyncio.run(send_email_async('测试邮件主题','这是一封测试邮件的正文内容。'))
+    asyncio.run(_main())
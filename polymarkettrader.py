@@ -1,10 +1,12 @@
 import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
-from time import sleep
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
-import requests
+import httpx
+import orjson
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import OrderArgs, OrderType, PostOrdersArgs, BalanceAllowanceParams
 from ctfredeemer import PolymarketCTFRedeemer
@@ -18,6 +20,13 @@ class PolymarketTrader:
         self.proxy_address = proxy_address
         self.client = None
         self._init_client()
+        # 共享的异步HTTP客户端（连接池保持长连接，请求期间不阻塞事件循环）
+        self.http = httpx.AsyncClient(http2=True, timeout=5,
+                                      limits=httpx.Limits(max_keepalive_connections=20))
+        # 市场token缓存：{(symbol, 周期时间戳): clobTokenIds}，只保留当前及之后的周期
+        self._token_cache: Dict[Tuple[str, int], List[str]] = {}
+        # 订单签名线程池（EIP-712签名为纯CPU计算，并行签名且不阻塞事件循环）
+        self._sign_pool = ThreadPoolExecutor(max_workers=4)
         self.redeemer = PolymarketCTFRedeemer(
             relayer_url="https://relayer-v2.polymarket.com",
             private_key=private_key,
@@ -47,24 +56,32 @@ class PolymarketTrader:
     async def submit_limit_orders(self, order_args):
         """创建并提交订单[citation:1]"""
         try:
-            post_order_args = []
+            # 并发获取本周期内尚未缓存的市场token，每个symbol只请求一次
+            interval_ts = self.get_next_interval_timestamp()
+            unseen_symbols = {order_arg["symbol"] for order_arg in order_args
+                              if (order_arg["symbol"], interval_ts) not in self._token_cache}
+            await asyncio.gather(*(self._fetch_tokens(symbol, interval_ts) for symbol in unseen_symbols))
+
+            arg_list = []
             for order_arg in order_args:
                 token_id = ""
-                token_ids = self.get_next_bet_token_ids(order_arg["symbol"])
+                token_ids = self._token_cache[(order_arg["symbol"], interval_ts)]
                 if order_arg["position"] == "up":
                     token_id = token_ids[0]
                 if order_arg["position"] == "down":
                     token_id = token_ids[1]
-                args = OrderArgs(
+                arg_list.append(OrderArgs(
                     price=order_arg["price"],  # 价格，单位 USDc
                     size=order_arg["size"],  # 数量
                     side=order_arg["side"],  # BUY 或 SELL
                     token_id=token_id  # 市场对应的 Token ID
-                )
-                sleep(0.1)
-                # 1. 签名订单
-                signed_order = self.client.create_order(args)
-                post_order_args.append(PostOrdersArgs(order=signed_order))
+                ))
+
+            # 1. 在线程池中并行签名订单
+            loop = asyncio.get_running_loop()
+            signed_orders = await asyncio.gather(
+                *(loop.run_in_executor(self._sign_pool, self.client.create_order, args) for args in arg_list))
+            post_order_args = [PostOrdersArgs(order=signed_order) for signed_order in signed_orders]
 
             # 2. 实际提交订单 (请谨慎操作)
             resp = self.client.post_orders(post_order_args)
@@ -74,13 +91,23 @@ class PolymarketTrader:
             logging.error(f"订单创建失败: {e}")
             return None
 
-    def get_next_bet_token_ids(self, symbol):
+    async def _fetch_tokens(self, symbol: str, interval_ts: int) -> List[str]:
+        """获取并缓存指定周期的市场token，同时清理已过期周期的缓存"""
+        for key in [key for key in self._token_cache if key[1] < interval_ts]:
+            del self._token_cache[key]
+        token_ids = await self.get_next_bet_token_ids(symbol, interval_ts)
+        self._token_cache[(symbol, interval_ts)] = token_ids
+        return token_ids
+
+    async def get_next_bet_token_ids(self, symbol, interval_ts=None):
         """获取下一个15min bet"""
-        slug = f"{symbol}-updown-15m-{self.get_next_interval_timestamp()}"
+        if interval_ts is None:
+            interval_ts = self.get_next_interval_timestamp()
+        slug = f"{symbol}-updown-15m-{interval_ts}"
 
         try:
             # 发送GET请求
-            response = requests.get(url=f"https://gamma-api.polymarket.com/markets/slug/{slug}")
+            response = await self.http.get(f"https://gamma-api.polymarket.com/markets/slug/{slug}")
             # 检查HTTP状态码
             response.raise_for_status()
 
@@ -90,10 +117,10 @@ class PolymarketTrader:
             except json.JSONDecodeError as e:
                 raise ValueError(f"JSON解析失败: {e}\n响应内容: {response.text[:200]}...")
 
-        except requests.exceptions.Timeout:
-            raise requests.exceptions.Timeout(f"请求超时...")
-        except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"请求失败: {e}")
+        except httpx.TimeoutException:
+            raise httpx.TimeoutException(f"请求超时...")
+        except httpx.HTTPError as e:
+            raise httpx.HTTPError(f"请求失败: {e}")
 
     def get_next_interval_timestamp(self, current_time=None, interval_minutes=15, return_as_milliseconds=False):
         """
@@ -109,42 +136,34 @@ class PolymarketTrader:
          """
         # 如果没有提供当前时间，使用当前系统时间
         if current_time is None:
-            current_time = datetime.now()
-
-        # 计算到下一个间隔需要增加的分钟数
-        minutes_to_add = interval_minutes - (current_time.minute % interval_minutes)
+            now = int(time.time())
+        else:
+            now = int(current_time.timestamp())
 
-        # 如果已经是间隔的倍数，取下一个间隔
-        if minutes_to_add == 0:
-            minutes_to_add = interval_minutes
+        # 整数运算取下一个间隔（恰好位于间隔点时也取下一个间隔）
+        step = interval_minutes * 60
+        timestamp_seconds = ((now // step) + 1) * step
 
-        # 计算下一个间隔时间
-        next_interval = current_time + timedelta(minutes=minutes_to_add)
-        next_interval = next_interval.replace(second=0, microsecond=0)
+        return timestamp_seconds * 1000 if return_as_milliseconds else timestamp_seconds
 
-        # 转换为时间戳
-        timestamp_seconds = next_interval.timestamp()
-
-        return int(timestamp_seconds * 1000) if return_as_milliseconds else int(timestamp_seconds)
-
-    def get_redeemable_positions(self):
+    async def get_redeemable_positions(self):
         """获取当前持仓"""
         try:
             logging.info(f"🛢️ 获取当前持仓...")
             # 发送GET请求
-            response = requests.get(url=f"https://data-api.polymarket.com/positions?user={self.proxy_address}")
+            response = await self.http.get(f"https://data-api.polymarket.com/positions?user={self.proxy_address}")
             # 检查HTTP状态码
             response.raise_for_status()
             # 尝试解析JSON响应 返回
             try:
-                return [position for _ in list(response.json()) if position and position["redeemable"]]
+                return [p for p in orjson.loads(response.content) if p and p.get("redeemable")]
             except json.JSONDecodeError as e:
                 raise ValueError(f"JSON解析失败: {e}\n响应内容: {response.text[:200]}...")
 
-        except requests.exceptions.Timeout:
-            raise requests.exceptions.Timeout(f"请求超时...")
-        except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"请求失败: {e}")
+        except httpx.TimeoutException:
+            raise httpx.TimeoutException(f"请求超时...")
+        except httpx.HTTPError as e:
+            raise httpx.HTTPError(f"请求失败: {e}")
 
     async def redeem(self, positions):
         """获取当前持仓"""
@@ -154,23 +173,22 @@ class PolymarketTrader:
                 result = await self.redeemer.redeem_positions(
                     collateral_token="0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174",  # Polygon USDC
                     condition_id=position['conditionId'],
-                    index_sets=[position['outcomeIndex']],  # 赎回YES or NO
+                    index_sets=[1 << position['outcomeIndex']],  # 赎回YES or NO（indexSet为结果位掩码：YES=1, NO=2）
                     parent_collection_id="0x0000000000000000000000000000000000000000000000000000000000000000"
                 )
 
                 if result["success"]:
+                    # Relayer已等待交易执行结果，这里不再阻塞等待链上回执，避免耽误买入窗口
                     logging.info(f"\n🎉 赎回成功！交易详情: {result['explorer_url']}")
-
-                    # 等待交易确认
-                    logging.info("等待交易确认...")
-                    status = await self.redeemer.get_transaction_status(result["transaction_hash"])
-                    logging.info(f"最终状态: {status}")
                 else:
                     logging.info(f"赎回失败: {result.get('error')}")
 
-        except requests.exceptions.Timeout:
-            raise requests.exceptions.Timeout(f"请求超时...")
-        except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"请求失败: {e}")
-
+        except httpx.TimeoutException:
+            raise httpx.TimeoutException(f"请求超时...")
+        except httpx.HTTPError as e:
+            raise httpx.HTTPError(f"请求失败: {e}")
 
+    async def close(self):
+        """关闭HTTP客户端和签名线程池"""
+        await self.http.aclose()
+        self._sign_pool.shutdown(wait=False)
@@ -0,0 +1,91 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numba import njit
+
+from datasaver import BacktestDataLoader, _kline_record_is_closed, _kline_record_to_row
+
+
+# 15分钟K线周期（毫秒）
+INTERVAL_MS = 900_000
+
+
+@njit("void(int64[:], float64[:], float64[:], float64[:], float64[:], float64[:], float64[:], boolean[:], boolean[:])",
+      cache=True)
+def scan(open_time, ex_o, ex_c, up_o, up_c, dn_o, dn_c, out_entry, out_exit):
+    """
+    按已闭合K线逐根扫描入场/出场条件（与 PmTradingStrategy 的判断一致）
+
+    第i个元素表示第i根K线闭合后的状态：第i根即"上一个周期"，第i-1根即"上上个周期"。
+    数据存在缺口时第i-1根并非相邻周期，此时不产生信号。
+    """
+    n = ex_o.shape[0]
+    if n > 0:
+        out_entry[0] = False
+        out_exit[0] = False
+    for i in range(1, n):
+        if open_time[i] - open_time[i - 1] != INTERVAL_MS:
+            out_entry[i] = False
+            out_exit[i] = False
+            continue
+        # 入场：汇率对连续两个周期上涨，买涨标的上一个周期阴线，买跌标的上一个周期阳线
+        out_entry[i] = (ex_c[i - 1] > ex_o[i - 1] and ex_c[i] > ex_o[i]
+                        and up_c[i] < up_o[i] and dn_c[i] > dn_o[i])
+        # 出场：汇率对连续两个周期下跌，买涨标的上一个周期阳线，买跌标的上一个周期阴线
+        out_exit[i] = (ex_c[i - 1] < ex_o[i - 1] and ex_c[i] < ex_o[i]
+                       and up_c[i] > up_o[i] and dn_c[i] < dn_o[i])
+
+
+def _closed_klines(records: List[Dict]) -> Dict[int, Tuple[float, float]]:
+    """从保存的K线记录中提取已闭合K线 {开盘时间: (开盘价, 收盘价)}"""
+    closed = {}
+    for k in records:
+        if _kline_record_is_closed(k):
+            open_time, open_price, _, _, close_price, _ = _kline_record_to_row(k)
+            closed[open_time] = (open_price, close_price)
+    return closed
+
+
+def load_backtest_arrays(up_symbol: str, down_symbol: str, exchange_symbol: str,
+                         start_date: str, end_date: str,
+                         base_dir: str = "./kline_data") -> Tuple[np.ndarray, ...]:
+    """
+    加载三个交易对的回测数据，按开盘时间对齐为SoA数组
+
+    Returns:
+        (open_time, ex_o, ex_c, up_o, up_c, dn_o, dn_c)
+    """
+    series = [
+        _closed_klines(BacktestDataLoader.load_date_range(symbol, start_date, end_date, base_dir))
+        for symbol in (exchange_symbol, up_symbol, down_symbol)
+    ]
+    # 只保留三个交易对都有数据的周期
+    open_times = sorted(set(series[0]).intersection(series[1], series[2]))
+
+    arrays = [np.array(open_times, dtype=np.int64)]
+    for closed in series:
+        arrays.append(np.array([closed[t][0] for t in open_times], dtype=np.float64))
+        arrays.append(np.array([closed[t][1] for t in open_times], dtype=np.float64))
+    return tuple(arrays)
+
+
+def backtest_signals(up_symbol: str, down_symbol: str, exchange_symbol: str,
+                     start_date: str, end_date: str,
+                     base_dir: str = "./kline_data") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    回放历史K线，一次性计算每个周期的入场/出场信号
+
+    Returns:
+        (open_time, entry, exit) 三个等长数组
+    """
+    open_time, ex_o, ex_c, up_o, up_c, dn_o, dn_c = load_backtest_arrays(
+        up_symbol, down_symbol, exchange_symbol, start_date, end_date, base_dir)
+
+    n = open_time.shape[0]
+    out_entry = np.zeros(n, dtype=np.bool_)
+    out_exit = np.zeros(n, dtype=np.bool_)
+    scan(open_time, ex_o, ex_c, up_o, up_c, dn_o, dn_c, out_entry, out_exit)
+
+    logging.info(f"回测信号计算完成: 周期数: {n} | 入场: {int(out_entry.sum())} | 出场: {int(out_exit.sum())}")
+    return open_time, out_entry, out_exit